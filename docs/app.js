@@ -271,6 +271,8 @@ const DQN_ROWS = 18, DQN_COLS = 30;
 
 async function loadOnnxModel() {
   if (typeof ort === "undefined") { console.warn("onnxruntime-web not loaded"); return; }
+  // FP32 model; export_onnx.py only keeps warehouse_dqn.int8.onnx when its argmax
+  // agreement with FP32 passes, and it isn't deployed here until that's been checked.
   try {
     onnxSession = await ort.InferenceSession.create("models/warehouse_dqn.onnx");
     uiLog("DQN model ready.");
@@ -1,13 +1,44 @@
 # rl/export_onnx.py
 # Export SB3 DQN policy to ONNX for browser inference (onnxruntime-web).
 
+import inspect
 import os
+import numpy as np
 import torch
 from stable_baselines3 import DQN
 from warehouse_env import WarehouseEnv
 
 MODEL_PATH = "models/warehouse_dqn.zip"
 ONNX_PATH  = "models/warehouse_dqn.onnx"
+INT8_PATH  = ONNX_PATH.replace(".onnx", ".int8.onnx")
+BATCH_PATH = ONNX_PATH.replace(".onnx", ".batch.onnx")  # dynamic batch, for make_replays
+
+INT8_CHECK_STEPS = 3000      # env observations used to compare INT8 against FP32
+INT8_MIN_AGREEMENT = 0.99    # min fraction of states where both pick the same action
+
+def _sample_obs(env, n_steps, seed=0):
+    """Observations from a random-action rollout (resetting on episode end)."""
+    rng = np.random.default_rng(seed)
+    obs, _ = env.reset(seed=seed)
+    samples = []
+    for _ in range(n_steps):
+        samples.append(obs)
+        obs, _, done, truncated, _ = env.step(int(rng.integers(5)))
+        if done or truncated:
+            obs, _ = env.reset()
+    return np.stack(samples).astype(np.float32)
+
+def _argmax_agreement(fp32_path, int8_path, obs):
+    """Fraction of obs where the FP32 and INT8 models pick the same greedy action."""
+    import onnxruntime as ort
+    fp32 = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"])
+    int8 = ort.InferenceSession(int8_path, providers=["CPUExecutionProvider"])
+    same = 0
+    for row in obs:  # exports are static batch=1
+        a = fp32.run(None, {"obs": row[None]})[0].argmax()
+        b = int8.run(None, {"obs": row[None]})[0].argmax()
+        same += int(a == b)
+    return same / len(obs)
 
 def main():
     print("Loading model…")
@@ -24,15 +55,20 @@ def main():
             self.policy = policy
 
         def forward(self, obs_flat: torch.Tensor):
-            # SB3 DQNPolicy.forward returns Q-values given flattened obs
-            return self.policy.forward(obs_flat)
+            # DQNPolicy.forward returns the argmax action; q_net gives the Q-values
+            return self.policy.q_net(obs_flat)
 
     qm = QModule(policy).to(device).eval()
 
     obs_size = env.rows * env.cols * 3  # matches your JS obs builder
+    # The browser always runs batch=1, so bake a static [1, obs_size] shape into the graph:
+    # ORT picks specialized kernels and skips per-call shape inference.
     dummy = torch.zeros(1, obs_size, dtype=torch.float32, device=device)
 
-    # Classic exporter (no extra packages required)
+    # Classic tracer exporter (no extra packages required); its graph is already a minimal
+    # Gemm/Relu stack. torch >= 2.9 defaults torch.onnx.export to the onnxscript-based
+    # exporter (local functions, external weights), so ask for the tracer explicitly.
+    legacy = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
     with torch.no_grad():
         torch.onnx.export(
             qm,
@@ -40,12 +76,46 @@ def main():
             ONNX_PATH,
             input_names=["obs"],
             output_names=["q_values"],
+            opset_version=17,
+            **legacy,
+        )
+        # Same graph with a dynamic batch axis so make_replays can batch its lockstep envs
+        torch.onnx.export(
+            qm,
+            dummy,
+            BATCH_PATH,
+            input_names=["obs"],
+            output_names=["q_values"],
             dynamic_axes={"obs": {0: "batch"}, "q_values": {0: "batch"}},
-            opset_version=12,
+            opset_version=17,
+            **legacy,
         )
 
     assert os.path.exists(ONNX_PATH), "ONNX file was not created."
-    print(f"✅ Exported ONNX to {ONNX_PATH}")
+    assert os.path.exists(BATCH_PATH), "Batched ONNX file was not created."
+    print(f"✅ Exported ONNX to {ONNX_PATH} (browser, batch=1) and {BATCH_PATH} (replays)")
+
+    # Dynamic INT8 quantization of the Linear layers (weights int8 per output channel,
+    # activations quantized at runtime)
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(
+        ONNX_PATH,
+        INT8_PATH,
+        weight_type=QuantType.QInt8,
+        op_types_to_quantize=["MatMul", "Gemm"],
+        per_channel=True,
+    )
+
+    assert os.path.exists(INT8_PATH), "INT8 ONNX file was not created."
+
+    # Only keep the INT8 model if it acts like the FP32 one on real env states
+    agreement = _argmax_agreement(ONNX_PATH, INT8_PATH, _sample_obs(env, INT8_CHECK_STEPS))
+    if agreement < INT8_MIN_AGREEMENT:
+        os.remove(INT8_PATH)
+        print(f"⚠️  INT8 argmax agreement {agreement:.1%} < {INT8_MIN_AGREEMENT:.0%}; "
+              f"discarded {INT8_PATH}, ship the FP32 model")
+    else:
+        print(f"✅ Quantized INT8 ONNX to {INT8_PATH} (argmax agreement {agreement:.1%})")
 
 if __name__ == "__main__":
     main()
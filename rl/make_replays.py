@@ -2,11 +2,13 @@
 # Forces the Python env to mirror docs/data/layout-01.json so labels match A..J.
 
 import json, os
-from stable_baselines3 import DQN
+import numpy as np
+import onnxruntime as ort
 from warehouse_env import WarehouseEnv
 
 LAYOUT_JSON = "../docs/data/layout-01.json"
 OUT_DIR = "../docs/data/episodes"
+ONNX_PATH = "models/warehouse_dqn.batch.onnx"  # dynamic-batch export (browser file is batch=1)
 N_EPISODES = 3
 MAX_STEPS = 600
 
@@ -31,40 +33,58 @@ def apply_layout(env: WarehouseEnv, layout: dict):
 
     # people count (spawn avoids items)
     env.n_people = int(layout.get("people", {}).get("count", 8))
-    env.people = env._spawn_people()
+    env.people = env._spawn_people()  # setters mark the layout dirty; env resyncs lazily
 
-    env.picked = set()
+    env.picked_mask = 0
     env.steps = 0
     env.done = False
     return label_order
 
-def roll_episode(env: WarehouseEnv, model: DQN, label_order, max_steps=600):
-    # env.reset() randomizes; immediately force layout to match website
-    env.reset()
-    layout = load_layout()
-    label_order = apply_layout(env, layout)
+def _frame(env: WarehouseEnv, t):
+    return {
+        "t": t,
+        "bot": env.bot,                      # [r,c]
+        "people": env.people,                # [[r,c], ...]
+        "picked_idx": [i for i in range(env.n_items) if env.picked_mask >> i & 1]  # indices into env.items
+    }
 
-    frames = []
-    done = truncated = False
+def predict_actions(sess: ort.InferenceSession, obs):
+    """Greedy actions (argmax over Q-values) for a (batch, obs_size) float32 obs batch."""
+    return sess.run(None, {"obs": obs})[0].argmax(axis=1)
+
+def roll_episodes(envs, sess: ort.InferenceSession, label_order, layout, max_steps=600):
+    """Roll one episode per env in lockstep so each step is a single batched predict."""
+    # Force the website layout, then reset without re-randomizing it.
+    # obs_buf row j holds the latest obs of active[j]; persistent across steps.
+    obs_buf = None
+    for j, env in enumerate(envs):
+        label_order = apply_layout(env, layout)
+        obs, _ = env.reset(options={"keep_layout": True})
+        if obs_buf is None:
+            obs_buf = np.empty((len(envs), obs.shape[0]), dtype=np.float32)
+        obs_buf[j] = obs
+
+    frames = [[] for _ in envs]
+    active = list(range(len(envs)))  # envs whose episode hasn't ended yet
     t = 0
-    obs, _ = env.reset()  # SB3 expects reset before first predict; reset then re-apply:
-    label_order = apply_layout(env, layout)
-
-    while not (done or truncated) and t < max_steps:
-      # predict → step
-        action, _ = model.predict(obs, deterministic=True)
-        # env.step handles ndarray action; no need to cast here
-        obs, r, done, truncated, _ = env.step(action)
-
-        frames.append({
-            "t": t,
-            "bot": env.bot,                      # [r,c]
-            "people": env.people,                # [[r,c], ...]
-            "picked_idx": sorted(list(env.picked))  # indices into env.items
-        })
+
+    while active and t < max_steps:
+        # predict → step (one forward pass for all still-running envs)
+        actions = predict_actions(sess, obs_buf[:len(active)])
+
+        still_active = []
+        for i, action in zip(active, actions):
+            env = envs[i]
+            obs, r, done, truncated, _ = env.step(action)
+            frames[i].append(_frame(env, t))
+            if not (done or truncated):
+                # Compact in place: this slot was already consumed by predict above
+                obs_buf[len(still_active)] = obs
+                still_active.append(i)
+        active = still_active
         t += 1
 
-    return {
+    return [{
         "meta": {
             "rows": env.rows, "cols": env.cols,
             "drop": env.drop,
@@ -72,19 +92,22 @@ def roll_episode(env: WarehouseEnv, model: DQN, label_order, max_steps=600):
             "items": env.items,           # coords list aligned to label_order
             "labels": label_order         # ["A","B",...]
         },
-        "frames": frames
-    }
+        "frames": env_frames
+    } for env, env_frames in zip(envs, frames)]
 
 if __name__ == "__main__":
     os.makedirs(OUT_DIR, exist_ok=True)
-    env = WarehouseEnv()
-    layout = load_layout()
-    labels = apply_layout(env, layout)
+    envs = [WarehouseEnv() for _ in range(N_EPISODES)]
+    layout = load_layout()  # parsed once, reused for every episode
+    labels = sorted(layout["items"].keys())
 
-    model = DQN.load("models/warehouse_dqn")  # ensure this path exists
+    if not os.path.exists(ONNX_PATH):
+        raise SystemExit(f"{ONNX_PATH} not found; run `python export_onnx.py` to export it from models/warehouse_dqn.zip")
+    # ONNX Runtime instead of SB3/torch: pre-fused graph, no autograd plumbing
+    sess = ort.InferenceSession(ONNX_PATH, providers=["CPUExecutionProvider"])
 
-    for i in range(1, N_EPISODES + 1):
-        ep = roll_episode(env, model, labels, MAX_STEPS)
+    episodes = roll_episodes(envs, sess, labels, layout, MAX_STEPS)
+    for i, ep in enumerate(episodes, start=1):
         out_path = os.path.join(OUT_DIR, f"rl-episode-{i:02d}.json")
         with open(out_path, "w") as f:
             json.dump(ep, f)
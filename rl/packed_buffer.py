@@ -0,0 +1,73 @@
+# rl/packed_buffer.py
+# DQN replay buffer that stores the binary warehouse obs as packed bits.
+
+import numpy as np
+from stable_baselines3.common.buffers import ReplayBuffer
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+
+
+class PackedReplayBuffer(ReplayBuffer):
+    """
+    ReplayBuffer for 0/1 observations (WarehouseEnv's flat item/people/bot planes).
+    Obs are stored with np.packbits (1 bit per cell-channel, ~203 bytes for 18x30x3
+    instead of 6480) and unpacked to float32 only for the sampled batch.
+    """
+
+    def __init__(self, buffer_size, observation_space, action_space, *args, **kwargs):
+        super().__init__(buffer_size, observation_space, action_space, *args, **kwargs)
+        assert np.all(observation_space.low == 0) and np.all(observation_space.high == 1), \
+            "PackedReplayBuffer only supports binary observations"
+
+        self._obs_dim = int(np.prod(self.obs_shape))
+        packed_shape = (self.buffer_size, self.n_envs, (self._obs_dim + 7) // 8)
+        # Replace the float32 arrays allocated by ReplayBuffer (never touched, so never paged in)
+        self.observations = np.zeros(packed_shape, dtype=np.uint8)
+        if not self.optimize_memory_usage:
+            self.next_observations = np.zeros(packed_shape, dtype=np.uint8)
+
+    def _pack(self, obs):
+        return np.packbits(np.asarray(obs).reshape(self.n_envs, -1) > 0.5, axis=-1)
+
+    def _unpack(self, packed):
+        bits = np.unpackbits(packed, axis=-1, count=self._obs_dim)
+        return bits.astype(np.float32).reshape(-1, *self.obs_shape)
+
+    def add(self, obs, next_obs, action, reward, done, infos):
+        action = action.reshape((self.n_envs, self.action_dim))
+
+        self.observations[self.pos] = self._pack(obs)
+        if self.optimize_memory_usage:
+            self.observations[(self.pos + 1) % self.buffer_size] = self._pack(next_obs)
+        else:
+            self.next_observations[self.pos] = self._pack(next_obs)
+
+        self.actions[self.pos] = np.array(action)
+        self.rewards[self.pos] = np.array(reward)
+        self.dones[self.pos] = np.array(done)
+
+        if self.handle_timeout_termination:
+            self.timeouts[self.pos] = np.array([info.get("TimeLimit.truncated", False) for info in infos])
+
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+            self.pos = 0
+
+    def _get_samples(self, batch_inds, env=None):
+        # Same as ReplayBuffer._get_samples, with obs unpacked after indexing
+        env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+
+        if self.optimize_memory_usage:
+            next_packed = self.observations[(batch_inds + 1) % self.buffer_size, env_indices, :]
+        else:
+            next_packed = self.next_observations[batch_inds, env_indices, :]
+
+        data = (
+            self._normalize_obs(self._unpack(self.observations[batch_inds, env_indices, :]), env),
+            self.actions[batch_inds, env_indices, :],
+            self._normalize_obs(self._unpack(next_packed), env),
+            # Only use dones that are not due to timeouts
+            (self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices])).reshape(-1, 1),
+            self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env),
+        )
+        return ReplayBufferSamples(*tuple(map(self.to_torch, data)))
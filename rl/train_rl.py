@@ -1,15 +1,55 @@
+import gymnasium as gym
+import torch
 from stable_baselines3 import DQN
+from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import SubprocVecEnv
+from packed_buffer import PackedReplayBuffer
 from warehouse_env import WarehouseEnv
 
-env = WarehouseEnv()
+N_ENVS = 8  # parallel env workers; env stepping is the bottleneck, not the MLP
+# Keep the single-env default of one gradient update per 4 transitions (train_freq=4)
+GRADIENT_STEPS = max(1, N_ENVS // 4)
 
-# Initialize model
-model = DQN("MlpPolicy", env, verbose=1, learning_rate=0.0005, buffer_size=50000)
 
-# Train for a few thousand steps
-model.learn(total_timesteps=100000)
+class SingleThreadEnv(gym.Wrapper):
+    """Pins torch to one thread inside each worker so N_ENVS procs don't oversubscribe cores."""
 
-# Save the model
-model.save("models/warehouse_dqn")
+    def __init__(self, env):
+        super().__init__(env)
+        torch.set_num_threads(1)
 
-print("✅ Training complete! Model saved to models/warehouse_dqn.zip")
+
+if __name__ == "__main__":
+    # Subprocess workers re-import this module, so everything stays under the main guard
+    env = make_vec_env(
+        WarehouseEnv,
+        n_envs=N_ENVS,
+        vec_env_cls=SubprocVecEnv,
+        wrapper_class=SingleThreadEnv,
+    )
+
+    # The policy is a tiny MLP: CPU beats GPU dispatch latency, and one thread avoids contention
+    torch.set_num_threads(1)
+
+    # Initialize model (one vec step = N_ENVS transitions into the replay buffer)
+    model = DQN(
+        "MlpPolicy",
+        env,
+        verbose=1,
+        learning_rate=0.0005,
+        buffer_size=50000,
+        replay_buffer_class=PackedReplayBuffer,  # bit-packed binary obs (~32x smaller buffer)
+        learning_starts=1000,
+        train_freq=(1, "step"),
+        gradient_steps=GRADIENT_STEPS,
+        device="cpu",
+    )
+
+    # Train for a few thousand steps
+    model.learn(total_timesteps=100000)
+
+    # Save the model
+    model.save("models/warehouse_dqn")
+    env.close()
+
+    print("✅ Training complete! Model saved to models/warehouse_dqn.zip")
@@ -1,7 +1,125 @@
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-import random
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+# Bot actions: 0=Up, 1=Down, 2=Left, 3=Right, 4=Wait
+_MOVE = np.array([[-1, 0], [1, 0], [0, -1], [0, 1], [0, 0]], dtype=np.int8)
+
+# People moves: down, up, right, left, idle
+_PEOPLE_DIRS = np.array([[1, 0], [-1, 0], [0, 1], [0, -1], [0, 0]], dtype=np.int16)
+
+
+@njit(cache=True)
+def _move_people_core(people_r, people_c, items_keys_sorted, rows, cols, rng_state):
+    """Move every person one random step in place and return their new packed keys.
+
+    Uses an xorshift64 PRNG on rng_state (uint64[1], advanced in place) so the loop
+    stays inside compiled code.
+    """
+    state = rng_state[0]
+    n = people_r.shape[0]
+    n_items = items_keys_sorted.shape[0]
+    new_keys = np.empty(n, dtype=np.uint16)
+    for i in range(n):
+        # Draw a direction index in [0, 5) from 3 random bits, rejecting 5..7
+        d = 5
+        while d >= 5:
+            state ^= state << np.uint64(13)
+            state ^= state >> np.uint64(7)
+            state ^= state << np.uint64(17)
+            d = int(state & np.uint64(7))
+        r = int(people_r[i])
+        c = int(people_c[i])
+        nr = min(max(r + int(_PEOPLE_DIRS[d, 0]), 0), rows - 1)
+        nc = min(max(c + int(_PEOPLE_DIRS[d, 1]), 0), cols - 1)
+        key = nr * cols + nc
+
+        # avoid items and don't double-book a cell this tick: neither one an earlier
+        # person just moved into, nor one a later (not yet moved) person still holds,
+        # since that person may end up blocked and stay put
+        j = np.searchsorted(items_keys_sorted, key)
+        blocked = j < n_items and items_keys_sorted[j] == key
+        if not blocked:
+            for k in range(i):  # n_people is small; linear scan beats a set
+                if new_keys[k] == key:
+                    blocked = True
+                    break
+        if not blocked:
+            for k in range(i + 1, n):
+                if int(people_r[k]) * cols + int(people_c[k]) == key:
+                    blocked = True
+                    break
+        if blocked:
+            nr, nc = r, c
+            key = r * cols + c
+
+        people_r[i] = nr
+        people_c[i] = nc
+        new_keys[i] = key
+    rng_state[0] = state
+    return new_keys
+
+
+@njit(cache=True, boundscheck=False)
+def _step_core(bot, people_r, people_c, people_keys, people_mask, items_keys_sorted,
+               item_grid, obs, picked_mask, all_picked, drop_key, rows, cols, action, rng_state):
+    """One fused env tick: move bot, pick/deliver, move people, collision check.
+
+    Updates bot, people arrays, people_mask and obs in place; returns
+    (reward, terminated, picked_mask).
+    """
+    reward = -0.01  # small living-time penalty
+    done = False
+
+    # ---- Move bot (try to step; don't step into a person) ----
+    br = int(bot[0])
+    bc = int(bot[1])
+    nr = min(max(br + int(_MOVE[action, 0]), 0), rows - 1)
+    nc = min(max(bc + int(_MOVE[action, 1]), 0), cols - 1)
+    if people_mask[nr * cols + nc] == 0:
+        obs[br, bc, 2] = 0.0
+        br, bc = nr, nc
+        bot[0] = br
+        bot[1] = bc
+        obs[br, bc, 2] = 1.0
+    key = br * cols + bc
+
+    # ---- Pick items ----
+    idx = item_grid[key]
+    if idx >= 0 and not (picked_mask >> idx) & 1:
+        picked_mask |= 1 << idx
+        reward += 1.0
+
+    # ---- Deliver all items ----
+    if key == drop_key and picked_mask == all_picked and all_picked != 0:
+        reward += 5.0
+        done = True
+
+    # ---- Move people ----
+    for i in range(people_r.shape[0]):
+        obs[people_r[i], people_c[i], 1] = 0.0
+        people_mask[people_keys[i]] = 0
+    new_keys = _move_people_core(people_r, people_c, items_keys_sorted, rows, cols, rng_state)
+    for i in range(people_r.shape[0]):
+        obs[people_r[i], people_c[i], 1] = 1.0
+        people_mask[new_keys[i]] = 1
+        people_keys[i] = new_keys[i]
+
+    # ---- Collision penalty (shouldn't happen due to check above, but guard anyway) ----
+    if people_mask[key]:
+        reward -= 2.0
+        done = True
+
+    return reward, done, picked_mask
+
 
 class WarehouseEnv(gym.Env):
     """
@@ -12,6 +130,13 @@ class WarehouseEnv(gym.Env):
       * Discrete grid world
       * People avoid shelves and item cells
       * Bot avoids stepping into a person cell
+    Layout state:
+      * bot / drop / items / people are properties over NumPy arrays. Reads return
+        fresh lists, so in-place edits (env.bot[0] = r) are lost; assign the whole
+        value instead (env.bot = [r, c]).
+      * Assigning any of them marks the layout dirty; cached obs and lookup grids are
+        rebuilt before the next step/observation. Changing rows/cols alone isn't
+        tracked: reassign items/people afterwards or call _sync_layout().
     """
     metadata = {"render_modes": ["ansi"]}
 
@@ -25,28 +150,111 @@ class WarehouseEnv(gym.Env):
         # Actions: 0=Up, 1=Down, 2=Left, 3=Right, 4=Wait
         self.action_space = spaces.Discrete(5)
 
-        # Observation: (rows, cols, 3) one-hot-ish planes: items, people, bot
+        # Observation: flattened (rows, cols, 3) one-hot-ish planes: items, people, bot.
+        # Flat so SB3 stores 1-D obs and the MLP sees the same layout as export_onnx/JS.
         self.observation_space = spaces.Box(
-            low=0, high=1, shape=(self.rows, self.cols, 3), dtype=np.float32
+            low=0, high=1, shape=(self.rows * self.cols * 3,), dtype=np.float32
         )
 
         # Static defaults; can be overridden by external layout (make_replays applies it)
-        self.drop = [1, 27]
-        self.bot = [1, 1]
-        self.items = []     # list[(r,c)]
-        self.people = []    # list[(r,c)]
-        self.picked = set() # indices of items picked
+        self._layout_dirty = True  # set by _mark_dirty, cleared by _sync_layout
+        self._drop = [1, 27]
+        self.bot_rc = np.array([1, 1], dtype=np.int16)  # exposed as list via `bot`
+        # Items/people are stored as SoA int16 rows/cols plus packed uint16 keys (r*cols+c);
+        # the `items`/`people` properties expose them as list[(r,c)] for replays/render.
+        self.items_r = np.empty(0, dtype=np.int16)
+        self.items_c = np.empty(0, dtype=np.int16)
+        self.items_keys = np.empty(0, dtype=np.uint16)         # aligned with item index
+        self.items_keys_sorted = np.empty(0, dtype=np.uint16)  # for searchsorted membership
+        self.people_r = np.empty(0, dtype=np.int16)
+        self.people_c = np.empty(0, dtype=np.int16)
+        self.people_keys = np.empty(0, dtype=np.uint16)
+        # Dense occupancy grid: people_mask[r*cols+c] == 1 iff a person stands there
+        self.people_mask = np.zeros(self.rows * self.cols, dtype=np.uint8)
+        self.picked_mask = 0 # bit i set = item i picked
         self.steps = 0
         self.done = False
+        self._item_grid = np.full(self.rows * self.cols, -1, dtype=np.int16)  # cell -> item index
+        self._drop_key = self.drop[0] * self.cols + self.drop[1]
+        self._all_picked = 0  # picked_mask value once every item is collected
+        self._rng_state = np.array([0x9E3779B97F4A7C15], dtype=np.uint64)  # xorshift state for _move_people_core
+
+        # Persistent observation, redrawn on layout sync and patched incrementally in step
+        self._obs = np.zeros((self.rows, self.cols, 3), dtype=np.float32)
+        self._obs_flat = self._obs.reshape(-1)  # view, no copy
+
+    # ---------------- Layout state ----------------
+    @property
+    def bot(self):
+        return self.bot_rc.tolist()
+
+    @bot.setter
+    def bot(self, rc):
+        self.bot_rc[:] = rc
+        self._mark_dirty()
+
+    @property
+    def drop(self):
+        return list(self._drop)
+
+    @drop.setter
+    def drop(self, rc):
+        self._drop = [int(rc[0]), int(rc[1])]
+        self._mark_dirty()
+
+    @property
+    def items(self):
+        return list(zip(self.items_r.tolist(), self.items_c.tolist()))
+
+    @items.setter
+    def items(self, coords):
+        rc = np.asarray(coords, dtype=np.int16).reshape(-1, 2)
+        self.items_r = rc[:, 0].copy()
+        self.items_c = rc[:, 1].copy()
+        # Items are static per episode, so sort once here
+        self.items_keys = self._pack(self.items_r, self.items_c)
+        self.items_keys_sorted = np.sort(self.items_keys)
+        self._mark_dirty()
+
+    @property
+    def people(self):
+        return list(zip(self.people_r.tolist(), self.people_c.tolist()))
+
+    @people.setter
+    def people(self, coords):
+        rc = np.asarray(coords, dtype=np.int16).reshape(-1, 2)
+        self.people_r = rc[:, 0].copy()
+        self.people_c = rc[:, 1].copy()
+        self._rebuild_people_mask()
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        """Defer the full cache rebuild, but resize obs/observation_space right away."""
+        self._layout_dirty = True
+        self._resize_obs()
+
+    def _rebuild_people_mask(self):
+        self.people_keys = self._pack(self.people_r, self.people_c)
+        if self.people_mask.shape[0] != self.rows * self.cols:
+            self.people_mask = np.zeros(self.rows * self.cols, dtype=np.uint8)
+        else:
+            self.people_mask.fill(0)
+        self.people_mask[self.people_keys] = 1
+
+    def _pack(self, r, c):
+        return (r.astype(np.uint16) * self.cols + c.astype(np.uint16)).astype(np.uint16)
 
     # ---------------- Core API ----------------
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
+        self._rng_state[0] = self.np_random.integers(1, 2**63)
 
-        # Randomize a default layout if none injected by external caller
-        self._randomize_layout()
+        # Randomize a default layout unless the caller injected one beforehand
+        # (make_replays: apply_layout(env, ...) then env.reset(options={"keep_layout": True}))
+        if not (options or {}).get("keep_layout"):
+            self._randomize_layout()
 
-        self.picked = set()
+        self.picked_mask = 0
         self.steps = 0
         self.done = False
 
@@ -54,54 +262,26 @@ class WarehouseEnv(gym.Env):
 
     def step(self, action):
         # SB3 sometimes gives action as np.ndarray([a]); normalize to int
-        try:
-            if hasattr(action, "item"):
-                action = int(action.item())
-            else:
-                action = int(action)
-        except Exception:
+        action = int(action.item() if hasattr(action, "item") else action)
+        if not 0 <= action <= 4:
             action = 4  # default to 'wait'
 
-        if action < 0 or action > 4:
-            action = 4
-
         if self.done:
             return self._get_obs(), 0.0, True, False, {}
+        if self._layout_dirty:
+            self._sync_layout()
 
         self.steps += 1
-        reward = -0.01  # small living-time penalty
-
-        # ---- Move bot (try to step; don't step into a person) ----
-        move = {0: (-1, 0), 1: (1, 0), 2: (0, -1), 3: (0, 1), 4: (0, 0)}[action]
-        new_r = int(np.clip(self.bot[0] + move[0], 0, self.rows - 1))
-        new_c = int(np.clip(self.bot[1] + move[1], 0, self.cols - 1))
-
-        if (new_r, new_c) not in self.people:
-            self.bot = [new_r, new_c]
-
-        # ---- Pick items ----
-        for idx, (r, c) in enumerate(self.items):
-            if [r, c] == self.bot and idx not in self.picked:
-                self.picked.add(idx)
-                reward += 1.0
-
-        # ---- Deliver all items ----
-        if self.bot == self.drop and len(self.picked) == len(self.items) and len(self.items) > 0:
-            reward += 5.0
-            self.done = True
-
-        # ---- Move people ----
-        self._move_people()
-
-        # ---- Collision penalty (shouldn't happen due to check above, but guard anyway) ----
-        if tuple(self.bot) in self.people:
-            reward -= 2.0
-            self.done = True
-
-        terminated = self.done
+        reward, terminated, picked_mask = _step_core(
+            self.bot_rc, self.people_r, self.people_c, self.people_keys, self.people_mask,
+            self.items_keys_sorted, self._item_grid, self._obs, self.picked_mask,
+            self._all_picked, self._drop_key, self.rows, self.cols, action, self._rng_state,
+        )
+        self.picked_mask = int(picked_mask)
+        self.done = bool(terminated)
         truncated = self.steps >= 500
 
-        return self._get_obs(), float(reward), bool(terminated), bool(truncated), {}
+        return self._get_obs(), float(reward), self.done, truncated, {}
 
     # ---------------- Helpers ----------------
     def _randomize_layout(self):
@@ -114,52 +294,61 @@ class WarehouseEnv(gym.Env):
         self.items = self._spawn_items()
         # People spawn avoiding items, bot, drop
         self.people = self._spawn_people()
+        self._sync_layout()
+
+    def _sync_layout(self):
+        """Refresh cached arrays after items/people/grid size change (runs lazily once dirty)."""
+        # Re-pack keys in case cols changed after the coords were assigned
+        self.items_keys = self._pack(self.items_r, self.items_c)
+        self.items_keys_sorted = np.sort(self.items_keys)
+        self._rebuild_people_mask()
+        # Dense cell -> item index grid for O(1) pickup checks in _step_core
+        self._item_grid = np.full(self.rows * self.cols, -1, dtype=np.int16)
+        self._item_grid[self.items_keys] = np.arange(self.items_keys.shape[0], dtype=np.int16)
+        self._drop_key = self.drop[0] * self.cols + self.drop[1]
+        self._all_picked = (1 << self.items_keys.shape[0]) - 1
+        self._redraw_obs()
+        self._layout_dirty = False
+
+    def _resize_obs(self):
+        if self._obs.shape != (self.rows, self.cols, 3):
+            self._obs = np.zeros((self.rows, self.cols, 3), dtype=np.float32)
+            self._obs_flat = self._obs.reshape(-1)
+            self.observation_space = spaces.Box(
+                low=0, high=1, shape=self._obs_flat.shape, dtype=np.float32
+            )
+
+    def _redraw_obs(self):
+        self._resize_obs()
+        grid = self._obs
+        grid.fill(0.0)
+        # channel 0 = items, 1 = people, 2 = bot
+        grid[self.items_r, self.items_c, 0] = 1.0
+        grid[self.people_r, self.people_c, 1] = 1.0
+        grid[self.bot_rc[0], self.bot_rc[1], 2] = 1.0
 
     def _spawn_items(self):
-        coords = set()
-        while len(coords) < self.n_items:
-            r = random.randint(2, self.rows - 2)
-            c = random.randint(2, self.cols - 2)
-            coords.add((r, c))
-        return list(coords)
+        # Distinct interior cells (rows/cols 2..n-2) in one batched draw
+        h, w = self.rows - 3, self.cols - 3
+        flat = self.np_random.choice(h * w, size=self.n_items, replace=False)
+        return list(zip((2 + flat // w).tolist(), (2 + flat % w).tolist()))
 
     def _spawn_people(self):
-        coords = set()
-        guards = 0
-        while len(coords) < self.n_people and guards < 10000:
-            guards += 1
-            r = random.randint(0, self.rows - 1)
-            c = random.randint(0, self.cols - 1)
-            if (r, c) in self.items:           # avoid item cells
-                continue
-            if [r, c] == self.drop:            # avoid drop
-                continue
-            if [r, c] == self.bot:             # avoid bot
-                continue
-            coords.add((r, c))
-        return list(coords)
-
-    def _move_people(self):
-        new_positions = set()
-        for (r, c) in self.people:
-            dr, dc = random.choice([(1,0),(-1,0),(0,1),(0,-1),(0,0)])  # (0,0)=idle sometimes
-            nr = int(np.clip(r + dr, 0, self.rows - 1))
-            nc = int(np.clip(c + dc, 0, self.cols - 1))
-            # avoid items and don't double-book same cell this tick
-            if (nr, nc) in self.items or (nr, nc) in new_positions:
-                nr, nc = r, c
-            new_positions.add((nr, nc))
-        self.people = list(new_positions)
+        free = np.ones(self.rows * self.cols, dtype=bool)
+        free[self.items_keys] = False                            # avoid item cells
+        free[self.drop[0] * self.cols + self.drop[1]] = False    # avoid drop
+        free[self.bot[0] * self.cols + self.bot[1]] = False      # avoid bot
+        cells = np.flatnonzero(free)
+        # Distinct free cells in one batched draw
+        flat = self.np_random.choice(cells, size=min(self.n_people, cells.size), replace=False)
+        return list(zip((flat // self.cols).tolist(), (flat % self.cols).tolist()))
 
     def _get_obs(self):
-        grid = np.zeros((self.rows, self.cols, 3), dtype=np.float32)
-        # channel 0 = items, 1 = people, 2 = bot
-        for (r, c) in self.items:
-            grid[r, c, 0] = 1.0
-        for (r, c) in self.people:
-            grid[r, c, 1] = 1.0
-        grid[self.bot[0], self.bot[1], 2] = 1.0
-        return grid
+        if self._layout_dirty:
+            self._sync_layout()
+        # Copy out of the persistent buffer: VecEnvs keep terminal_observation by reference
+        # and then reset(), which would redraw it in place.
+        return self._obs_flat.copy()
 
     # Optional console renderer
     def render(self):